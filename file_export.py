@@ -9,20 +9,273 @@ bl_info = {
 
 import bpy
 import bpy_extras
+import bmesh
 from bpy_extras.io_utils import ExportHelper
 from bpy.props import *
 from bpy.types import Operator
 import json
-import mathutils
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from pathlib import Path
 from math import radians
 
+# orjson is not bundled with Blender, use it when it's installed and fall back to json otherwise
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Exported files are written in large chunks, the frames of animation files are appended one by one
+FILE_BUFFER_SIZE = 1 << 20
+
+# Applied to the transposed local matrix of a node, converts Blender's Z-up into the left-handed Y-up
+# coordinate system: row 1 becomes the negated row 2 and row 2 becomes row 1
+Y_UP_BASIS = np.array([
+    [1.0, 0.0,  0.0, 0.0],
+    [0.0, 0.0, -1.0, 0.0],
+    [0.0, 1.0,  0.0, 0.0],
+    [0.0, 0.0,  0.0, 1.0]])
+
+# Shader sockets an image texture can be linked to -> material file key of the texture
+SOCKET_TO_KEY = {
+    'Base Color': 'Albedo',
+    'Metallic': 'Metalness',
+    'Roughness': 'Roughness'
+}
+
 
 def console_log(message: str):
     '''Helper function to write a log to the Blender's console'''
     print(message)
 
 
+def write_json(filepath, data, indent=None):
+    '''Helper function to write data as a JSON file. \n
+    Uses orjson if it's available, otherwise json encodes the whole document with its C encoder. \n
+    Without indent the compact encoder is used'''
+    if orjson is not None:
+        # orjson only supports 2 space indentation
+        options = orjson.OPT_INDENT_2 if indent is not None else 0
+        with open(filepath, 'wb', buffering=FILE_BUFFER_SIZE) as output:
+            output.write(orjson.dumps(data, option=options))
+        return
+    
+    separators = (',', ':') if indent is None else None
+    with open(filepath, 'w', encoding='utf-8', buffering=FILE_BUFFER_SIZE) as output:
+        output.write(json.dumps(data, indent=indent, separators=separators))
+
+
+def encode_json(data):
+    '''Helper function to encode data as a compact JSON string'''
+    if orjson is not None:
+        return orjson.dumps(data).decode('utf-8')
+    return json.dumps(data, separators=(',', ':'))
+
+
+def matrix_to_json(matrix):
+    '''Helper function to write a 4x4 matrix as rows 'r0'..'r3' of space separated values. \n
+    Accepts a mathutils.Matrix or anything NumPy can read as a 4x4 array'''
+    rows = np.asarray(matrix, dtype=np.float64).tolist()
+    return {f'r{i}': ' '.join(map(repr, row)) for i, row in enumerate(rows)}
+
+
+def write_binary_mesh(filepath, vertices, group_indices, group_weights, uvs, normals, tangents, faces):
+    '''Helper function to write mesh tables as a packed little-endian binary file. \n
+    Layout: b'MESH', uint32 counts (vertices, uvs, normals, tangents, triangles), then
+    the tables in the same order as the text format. Normals and tangents are octahedral encoded'''
+    counts = (len(vertices), len(uvs), len(normals), len(tangents), len(faces))
+    with open(filepath, 'wb', buffering=FILE_BUFFER_SIZE) as file:
+        file.write(b'MESH')
+        np.asarray(counts, dtype='<u4').tofile(file)
+        np.asarray(vertices, dtype='<f4').tofile(file)
+        np.asarray(group_indices, dtype='<i4').tofile(file)
+        np.asarray(group_weights, dtype='<f4').tofile(file)
+        np.asarray(uvs, dtype='<f4').tofile(file)
+        np.asarray(normals, dtype='i1').tofile(file)
+        np.asarray(tangents, dtype='i1').tofile(file)
+        np.asarray(faces, dtype='<i4').tofile(file)
+
+
+def encode_octahedral(values):
+    '''Helper function to pack unit vectors into 2 signed bytes each. \n
+    The vector is projected on the octahedron |x|+|y|+|z| = 1 and the lower half is folded over the upper one'''
+    vectors = values.astype(np.float64)
+    vectors /= np.maximum(np.abs(vectors).sum(axis=1, keepdims=True), 1e-12)
+    x, y, z = vectors.T
+    
+    lower = z < 0.0
+    sign_x = np.where(x >= 0.0, 1.0, -1.0)
+    sign_y = np.where(y >= 0.0, 1.0, -1.0)
+    x, y = np.where(lower, (1.0 - np.abs(y)) * sign_x, x), np.where(lower, (1.0 - np.abs(x)) * sign_y, y)
+    
+    return np.round(np.stack((x, y), axis=1) * 127.0).astype(np.int8)
+
+
+def format_rows(line_format, rows):
+    '''Helper function to format a whole table at once. \n
+    The line template is repeated once per row and filled with all values in a single % operation'''
+    return (line_format * len(rows)) % tuple(np.asarray(rows).ravel().tolist())
+
+
+def unique_rows(rows):
+    '''Helper function to deduplicate per-loop attributes. \n
+    Returns the unique rows in order of first appearance and the per-loop index into them'''
+
+    # Round to canonicalize values that only differ by float noise, adding 0.0 turns -0.0 into 0.0
+    if rows.dtype.kind == 'f':
+        rows = rows.astype(np.float64).round(6) + 0.0
+    
+    # Compare whole rows as raw bytes, which avoids the structured dtype of np.unique(axis=0)
+    rows = np.ascontiguousarray(rows)
+    keys = rows.view(np.dtype((np.void, rows.itemsize * rows.shape[1]))).ravel()
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    
+    # Number the unique rows in order of first appearance, like an insertion-ordered dict would
+    order = np.argsort(first)
+    remap = np.empty_like(order)
+    remap[order] = np.arange(len(order))
+    return rows[first[order]], remap[inverse.ravel()]
+
+
+def unique_loop_rows(rows, loop_vertices, vertex_count):
+    '''Helper function to deduplicate per-loop attributes that are usually shared by all loops of a vertex. \n
+    If every loop of a vertex has the same value (smooth normals, UVs without seams), only the per-vertex
+    table is deduplicated, which is several times smaller. Returns the same tables as unique_rows'''
+    if rows.dtype.kind == 'f':
+        rows = rows.astype(np.float64).round(6) + 0.0
+    
+    # Scatter the loop values to their vertices and check that reading them back changes nothing
+    table = np.zeros((vertex_count, rows.shape[1]), dtype=rows.dtype)
+    table[loop_vertices] = rows
+    if not np.array_equal(table[loop_vertices], rows):
+        return unique_rows(rows)
+    
+    # Vertices without loops have no value and must not add a row
+    used = np.zeros(vertex_count, dtype=bool)
+    used[loop_vertices] = True
+    used_vertices = np.flatnonzero(used)
+    
+    values, vertex_indices = unique_rows(table[used_vertices])
+    indices = np.zeros(vertex_count, dtype=vertex_indices.dtype)
+    indices[used_vertices] = vertex_indices
+    return values, indices[loop_vertices]
+
+
+def write_mesh_data(filepath, vertices, group_indices, group_weights, loop_vertices,
+                    loop_uvs, loop_normals, loop_tangents, triangle_loops, binary):
+    '''Helper function to write mesh arrays read by SceneExporter.export_mesh. \n
+    Deduplicates per-loop attributes and writes the text or binary mesh file. \n
+    Does not touch Blender data, so it is safe to run on a worker thread'''
+
+    # Binary meshes store unit vectors as octahedral encoded bytes, which also merges near-equal ones
+    if binary:
+        loop_normals = encode_octahedral(loop_normals)
+        loop_tangents = encode_octahedral(loop_tangents)
+    
+    # Deduplicate UVs, normals and tangents and get per-loop indices into the tables
+    vertex_count = len(vertices)
+    uvs, loop_uvs = unique_loop_rows(loop_uvs, loop_vertices, vertex_count)
+    normals, loop_normals = unique_loop_rows(loop_normals, loop_vertices, vertex_count)
+    tangents, loop_tangents = unique_loop_rows(loop_tangents, loop_vertices, vertex_count)
+    
+    # v/vt/vn/vtan indices for every corner of every triangle, gathered in a single indexing pass
+    loop_indices = np.column_stack((loop_vertices, loop_uvs, loop_normals, loop_tangents))
+    faces = loop_indices[triangle_loops]
+    
+    if binary:
+        write_binary_mesh(filepath, vertices, group_indices, group_weights, uvs, normals, tangents, faces)
+        return
+    
+    ### Write data to file
+    # v - vertex object coordinates
+    # gi - vertex group index
+    # gw - vertex group weight
+    # vt - vertex UV coordinates
+    # vn - vertex normal
+    # vtan - vertex tangent
+    # f - polygon 'v/vt/vn/vtan'
+    parts = [
+        format_rows('v %r %r %r\n', vertices),
+        format_rows('gi %r %r %r %r\n', group_indices),
+        format_rows('gw %r %r %r %r\n', group_weights),
+        format_rows('vt %r %r\n', uvs),
+        format_rows('vn %r %r %r\n', normals),
+        format_rows('vtan %r %r %r\n', tangents),
+    ]
+    
+    # Triangles always have 3 corners, so a face is one template filled with 12 indices
+    parts.append(format_rows('f ' + '%d/%d/%d/%d ' * 3 + '\n', faces.reshape(-1, 12)))
+    
+    # Single write instead of one call per token
+    with open(filepath, 'w', buffering=FILE_BUFFER_SIZE) as file:
+        file.write(''.join(parts))
+
+
+def sample_pose_fcurves(armature_obj, action, frames):
+    '''Helper function to sample bone transforms relative to their parents straight from the action's F-Curves. \n
+    Returns (bone name, locations, rotations) per pose bone, rotations are (w, x, y, z) quaternions. \n
+    Returns None if the pose depends on anything besides the F-Curves, the frames have to be evaluated then'''
+    animation_data = armature_obj.animation_data
+    if animation_data.drivers or animation_data.nla_tracks:
+        return None
+    
+    for pose_bone in armature_obj.pose.bones:
+        bone = pose_bone.bone
+        if (pose_bone.constraints or pose_bone.rotation_mode != 'QUATERNION' or not bone.use_inherit_rotation
+                or bone.inherit_scale != 'FULL' or not bone.use_local_location or bone.use_relative_parent):
+            return None
+    
+    curves = {(curve.data_path, curve.array_index): curve for curve in action.fcurves}
+    frames = list(frames)
+    
+    def sample(pose_bone, prop):
+        # Channels without a curve keep the pose bone's current value on every frame
+        path = pose_bone.path_from_id(prop)
+        values = getattr(pose_bone, prop)
+        channels = []
+        for index in range(len(values)):
+            curve = curves.get((path, index))
+            if curve is None:
+                channels.append(np.full(len(frames), values[index]))
+            else:
+                channels.append(np.array([curve.evaluate(frame) for frame in frames]))
+        return np.stack(channels, axis=-1)
+    
+    bones = []
+    for pose_bone in armature_obj.pose.bones:
+        bone = pose_bone.bone
+        
+        # Rest transform relative to the parent bone, matrix = parent.matrix @ rest @ basis
+        rest = bone.matrix_local
+        if bone.parent:
+            rest = bone.parent.matrix_local.inverted() @ rest
+        rest_location = np.array(rest.to_translation())
+        rest_rotation = np.array(rest.to_3x3())
+        w0, x0, y0, z0 = rest.to_quaternion()
+        
+        # Blender ignores the location of connected bones, they always start at the parent's tail
+        if bone.use_connect:
+            locations = np.tile(rest_location, (len(frames), 1))
+        else:
+            locations = rest_location + sample(pose_bone, 'location') @ rest_rotation.T
+        
+        rotations = sample(pose_bone, 'rotation_quaternion')
+        rotations /= np.linalg.norm(rotations, axis=1, keepdims=True)
+        w, x, y, z = rotations.T
+        rotations = np.stack((w0 * w - x0 * x - y0 * y - z0 * z,
+                              w0 * x + x0 * w + y0 * z - z0 * y,
+                              w0 * y - x0 * z + y0 * w + z0 * x,
+                              w0 * z + x0 * y - y0 * x + z0 * w), axis=-1)
+        rotations[rotations[:, 0] < 0.0] *= -1.0  # Same hemisphere as Matrix.decompose()
+        
+        bones.append((pose_bone.name, locations.tolist(), rotations.tolist()))
+    
+    return bones
+
+
 class SceneExporter(Operator, ExportHelper):
     '''This appears in the tooltip of the operator and in the generated docs'''
     
@@ -56,6 +309,18 @@ class SceneExporter(Operator, ExportHelper):
         default=True
     )
     
+    use_binary_mesh: BoolProperty(
+        name='Binary Mesh',
+        description='Write mesh files as packed binary data instead of text',
+        default=False
+    )
+    
+    pretty_print: BoolProperty(
+        name='Pretty Print',
+        description='Indent JSON files by 2 spaces for reading, the files are written compact otherwise',
+        default=False
+    )
+    
     
     def execute(self, context):
         '''Run export command with given context'''
@@ -70,28 +335,77 @@ class SceneExporter(Operator, ExportHelper):
         to_json = {}
         to_json['Name'] = Path(bpy.data.filepath).stem  # Scene name
     
+        # All node files are written next to the scene file
+        parent_path = os.fspath(Path(filepath).parent) + os.sep
+        
+        # Resolved once instead of walking the context for every node
+        self._scene = context.scene
+        self._json_indent = 2 if self.pretty_print else None  # orjson can only indent by 2
+        
+        # Object name -> file name of its files, see node_file_name
+        self._file_names = {}
+        self._used_file_names = set()
+        
+        # Mesh/material/armature key -> file name of the first node that exported it, see export_node
+        self._exported_meshes = {}
+        self._exported_materials = {}
+        self._exported_armatures = {}
+        self._exported_animations = {}
+    
         # Export scene root nodes
-        with open(filepath, 'w', encoding='utf-8') as output:
-            json_objects = []
-            for node in bpy.context.scene.objects:
-                if node.parent is None:
-                    json_objects.append(node.name + '.node')
-                    self.export_node(node, filepath)
-            to_json['Nodes'] = json_objects
-
-            output.write(json.dumps(to_json, indent=4, sort_keys=True))
+        stack = [node for node in self._scene.objects if node.parent is None]
+        to_json['Nodes'] = [self.node_file_name(node) + '.node' for node in stack]
+        
+        # Walk the hierarchy without recursion. Blender data is only read here, node, mesh, material,
+        # light and armature files are written afterwards from the collected (writer, arguments) pairs
+        self._pending = []
+        visited = set()
+        while stack:
+            node = stack.pop()
+            if node.name in visited:
+                continue
+            visited.add(node.name)
+            
+            node_filepath, node_json, children = self.export_node(node, parent_path)
+            self._pending.append((write_json, (node_filepath, node_json, self._json_indent)))
+            stack.extend(children)
+        
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            for future in [executor.submit(writer, *args) for writer, args in self._pending]:
+                future.result()
+        
+        write_json(filepath, to_json, self._json_indent)
     
         return {'FINISHED'}
 
+    
+    def node_file_name(self, node):
+        '''Returns the name (without extension) of the node's files. \n
+        Characters that are not safe in file names are replaced, and names that would end up
+        the same (ignoring case, for case-insensitive filesystems) get a numeric suffix'''
+
+        file_name = self._file_names.get(node.name)
+        if file_name is None:
+            base_name = re.sub(r'[^\w.-]', '_', node.name)
+            file_name = base_name
+            suffix = 1
+            while file_name.lower() in self._used_file_names:
+                file_name = f'{base_name}_{suffix}'
+                suffix += 1
+            
+            self._used_file_names.add(file_name.lower())
+            self._file_names[node.name] = file_name
         
-    def export_node(self, node, filepath):
-        '''Exports the node to the given filepath. \n
-        Parses mesh, material, animations and light components'''
+        return file_name
 
-        parent_path = str(Path(filepath).parent) + '\\'
+        
+    def export_node(self, node, parent_path):
+        '''Exports the node's components to the given directory (ending with a separator). \n
+        Parses mesh, material, animations and light components. \n
+        Returns the node's filepath and data, and the children nodes to export next'''
 
         # Node datapath  
-        node_name = node.name
+        node_name = self.node_file_name(node)
         node_filepath = parent_path + node_name + '.node'
 
         # Material datapath  
@@ -116,54 +430,66 @@ class SceneExporter(Operator, ExportHelper):
         
 
         # Parse transformation matrix and convert coordinate system to left-handed (Y-up)
-        transform_matrix = mathutils.Matrix.transposed(node.matrix_local)
-        translation = transform_matrix[3]
-        transform_matrix_copy = transform_matrix.copy()
-        transform_matrix[1], transform_matrix[2] = -transform_matrix_copy[2], transform_matrix_copy[1]
-        
-        # Parse children objects
-        children_objects = []
-        for child in node.children:
-            if node.type == 'CAMERA':
-                continue            
-            children_objects.append(child.name + '.node')
-            self.export_node(child, filepath)
-        
-        # Write node's data
+        transform_matrix = Y_UP_BASIS @ np.asarray(node.matrix_local, dtype=np.float64).T
+        
+        # Parse children objects, the hierarchy is not exported below cameras
+        children = []
+        if node.type != 'CAMERA':
+            children = list(node.children)
+        
+        # Collect node's data
         to_json = {}
-        to_json['Name'] = node_name
-        to_json['Transform'] = {
-            'r0': f'{transform_matrix[0][0]} {transform_matrix[0][1]} {transform_matrix[0][2]} {transform_matrix[0][3]}',
-            'r1': f'{transform_matrix[1][0]} {transform_matrix[1][1]} {transform_matrix[1][2]} {transform_matrix[1][3]}',
-            'r2': f'{transform_matrix[2][0]} {transform_matrix[2][1]} {transform_matrix[2][2]} {transform_matrix[2][3]}',
-            'r3': f'{translation[0]} {translation[1]} {translation[2]} {translation[3]}'
-        }
-        to_json['Children'] = children_objects
+        to_json['Name'] = node.name
+        to_json['Transform'] = matrix_to_json(transform_matrix)
+        to_json['Children'] = [self.node_file_name(child) + '.node' for child in children]
 
         # Parse data for specific types
         if node.type == 'MESH':
-            to_json['Material'] = material_filename
-            self.export_material(node, material_filepath)
-            
-            to_json['Mesh'] = mesh_filename
-            self.export_mesh(node, mesh_filepath)
+            # Objects sharing a material or mesh datablock reference the files of the first of them
+            material = node.active_material
+            if material is not None:
+                if material.name not in self._exported_materials:
+                    self._exported_materials[material.name] = material_filename
+                    self.export_material(node, material_filepath)
+                to_json['Material'] = self._exported_materials[material.name]
             
-            to_json['Armature'] = armature_filename
-            self.export_armature(node, armature_filepath)
+            mesh_key = node.data.name
+            if mesh_key not in self._exported_meshes:
+                self._exported_meshes[mesh_key] = mesh_filename
+                self.export_mesh(node, mesh_filepath)
+            to_json['Mesh'] = self._exported_meshes[mesh_key]
             
-            to_json['Animation'] = animation_filename
-            self.export_animation(node, animation_filepath)
+            # Bone IDs are the object's vertex group indices, so the armature file also depends on them
+            armature_obj = node.find_armature()
+            if armature_obj is None:
+                console_log(f'Armature for {node.name} not found')
+            else:
+                armature_key = (armature_obj.name, tuple(node.vertex_groups.keys()))
+                if armature_key not in self._exported_armatures:
+                    self._exported_armatures[armature_key] = armature_filename
+                    self.export_armature(node, armature_obj, armature_filepath)
+                to_json['Armature'] = self._exported_armatures[armature_key]
+                
+                # Armatures the object is only parented to, or static rigs, have no action to export
+                animation_data = armature_obj.animation_data
+                if animation_data is None or animation_data.action is None:
+                    console_log(f'Animation for {node.name} not found')
+                else:
+                    if armature_obj.name not in self._exported_animations:
+                        self._exported_animations[armature_obj.name] = animation_filename
+                        self.export_animation(armature_obj, animation_filepath)
+                    to_json['Animation'] = self._exported_animations[armature_obj.name]
             
         elif node.type == 'LIGHT':
             to_json['Light'] = light_filepath
             self.export_light(node, light_filepath)
             
-        with open(node_filepath, 'w', encoding='utf-8') as output:
-            output.write(json.dumps(to_json, indent=4))
+        return node_filepath, to_json, children
             
 
     def export_mesh(self, object, filepath):
         '''Exports object's mesh to the filepath. \n
+        Mesh data is read here and written later by write_mesh_data. \n
         Mesh data:
           - v - vertex object coordinates
           - gi - vertex group index
@@ -171,101 +497,88 @@ class SceneExporter(Operator, ExportHelper):
           - vt - vertex UV coordinates
           - vn - vertex normal
           - vtan - vertex tangent
-          - f - polygon (v/vt/vn/vtan)'''
+          - f - triangle (v/vt/vn/vtan)'''
 
-        def exists(arr, target):
-            for elem in arr:
-                if elem == target:
-                    return True
-            return False
-        
-        def get_index(arr, target):
-            for i in range(len(arr)):
-                if arr[i] == target:
-                    return i
-            return -1
-        
         console_log(f'Exporting mesh to {filepath}...')
 
-        bpy.context.view_layer.objects.active = object
-        # Triangulate mesh
-        bpy.ops.object.modifier_add(type='TRIANGULATE')
-        bpy.ops.object.modifier_apply(modifier='Triangulate')
-        
-        mesh = object.to_mesh()
-        mesh.calc_tangents() # Generate tangents data
-        
-        vertices = [v for v in object.data.vertices.values()]
-        normals = []
-        tangents = []
-        uvs = []
-        
-        # Get UVs
-        for uv in mesh.uv_layers.active.data:
-            if not exists(uvs, uv.uv):
-                uvs.append(uv.uv)
-        
-        # Get normals and tangents
-        for polygon in mesh.polygons:
-            for index in range(polygon.loop_start, polygon.loop_start + polygon.loop_total):
-                if not exists(normals, mesh.loops[index].normal):
-                    normals.append(mesh.loops[index].normal)
-                    
-                if not exists(tangents, mesh.loops[index].tangent):
-                    tangents.append(mesh.loops[index].tangent)
-        
-        ### Write data to file
-        # v - vertex object coordinates
-        # gi - vertex group index
-        # gw - vertex group weight
-        # vt - vertex UV coordinates
-        # vn - vertex normal
-        # vtan - vertex tangent
-        # f - polygon 'v/vt/vn/vtan'
-        with open(filepath, 'w') as file:
-            for vert in vertices:
-                file.write(f'v {vert.co.x} {vert.co.y} {vert.co.z}\n')
-            
-            for vertex in object.data.vertices:
-                file.write('gi')
-
+        mesh = object.data
+        
+        # Tangents can only be calculated for triangles and quads, so n-gons have to be split first.
+        # That is done on a temporary copy, meshes without n-gons are read directly
+        loop_totals = np.empty(len(mesh.polygons), dtype=np.int32)
+        mesh.polygons.foreach_get('loop_total', loop_totals)
+        use_copy = bool(loop_totals.size) and loop_totals.max() > 4
+        if use_copy:
+            mesh = object.to_mesh()
+        
+        try:
+            if use_copy:
+                bm = bmesh.new()
+                bm.from_mesh(mesh)
+                bmesh.ops.triangulate(bm, faces=[face for face in bm.faces if len(face.verts) > 4])
+                bm.to_mesh(mesh)
+                bm.free()
+        
+            mesh.calc_tangents() # Generate tangents data
+            mesh.calc_loop_triangles() # Triangulated faces, without modifying the mesh
+        
+            # Collections are resolved once and shared by all reads below
+            loops = mesh.loops
+            uv_data = mesh.uv_layers.active.data
+            object_vertices = object.data.vertices
+            loops_count = len(loops)
+        
+            # Bulk read vertex and per-loop attributes
+            vertices = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+            mesh.vertices.foreach_get('co', vertices)
+            vertices = vertices.reshape(-1, 3)
+        
+            loop_vertices = np.empty(loops_count, dtype=np.int32)
+            loops.foreach_get('vertex_index', loop_vertices)
+        
+            loop_uvs = np.empty(loops_count * 2, dtype=np.float32)
+            uv_data.foreach_get('uv', loop_uvs)
+            loop_uvs = loop_uvs.reshape(-1, 2)
+        
+            loop_normals = np.empty(loops_count * 3, dtype=np.float32)
+            loops.foreach_get('normal', loop_normals)
+            loop_normals = loop_normals.reshape(-1, 3)
+        
+            loop_tangents = np.empty(loops_count * 3, dtype=np.float32)
+            loops.foreach_get('tangent', loop_tangents)
+            loop_tangents = loop_tangents.reshape(-1, 3)
+        
+            triangle_loops = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int32)
+            mesh.loop_triangles.foreach_get('loops', triangle_loops)
+            triangle_loops = triangle_loops.reshape(-1, 3)
+        finally:
+            # Neither the temporary mesh nor the tangent layer is left behind, even if reading failed
+            if use_copy:
+                object.to_mesh_clear()
+            else:
+                mesh.free_tangents()
+        
+        # Up to 4 vertex groups per vertex, indices and weights are collected in the same pass.
+        # Without vertex groups every vertex has empty tables, so the pass is skipped entirely
+        if len(object.vertex_groups) == 0:
+            group_indices = np.zeros((len(object_vertices), 4), dtype=np.int32)
+            group_weights = np.zeros((len(object_vertices), 4), dtype=np.float64)
+        else:
+            group_indices = []
+            group_weights = []
+            for vertex in object_vertices:
                 vertex_groups = [0, 0, 0, 0]
-                for i in range(len(vertex.groups)):
-                    if i >= 4:
-                        break
-                    vertex_groups[i] = vertex.groups[i].group
-
-                for group_id in vertex_groups:
-                    file.write(f' {group_id}')
-                file.write('\n')
-                
-            for vertex in object.data.vertices:
-                file.write('gw')
-
                 vertex_group_weights = [0.0, 0.0, 0.0, 0.0]
-                for i in range(len(vertex.groups)):
-                    if i >= 4:
-                        break
-                    vertex_group_weights[i] = vertex.groups[i].weight
-
-                for group_weight in vertex_group_weights:
-                    file.write(f' {group_weight}')
-                file.write('\n')
-                
-            for uv in uvs:
-                file.write(f'vt {uv[0]} {uv[1]}\n')
-            
-            for normal in normals:
-                file.write(f'vn {normal[0]} {normal[1]} {normal[2]}\n')
-            
-            for tangent in tangents:
-                file.write(f'vtan {tangent[0]} {tangent[1]} {tangent[2]}\n')
-            
-            for polygon in mesh.polygons:
-                file.write(f'f ')
-                for index in range(polygon.loop_start, polygon.loop_start + polygon.loop_total):
-                    file.write(f'{mesh.loops[index].vertex_index}/{get_index(uvs, mesh.uv_layers.active.data[index].uv)}/{get_index(normals, mesh.loops[index].normal)}/{get_index(tangents, mesh.loops[index].tangent)} ')
-                file.write('\n')
+                for i, group in enumerate(vertex.groups[:4]):
+                    vertex_groups[i] = group.group
+                    vertex_group_weights[i] = group.weight
+                group_indices.append(vertex_groups)
+                group_weights.append(vertex_group_weights)
+        
+        # Everything below works on plain arrays, so it is done by the writer threads
+        self._pending.append((write_mesh_data, (filepath, vertices, group_indices, group_weights, loop_vertices,
+                                                loop_uvs, loop_normals, loop_tangents, triangle_loops,
+                                                self.use_binary_mesh)))
     
     
     def export_material(self, object, filepath):
@@ -286,30 +599,24 @@ class SceneExporter(Operator, ExportHelper):
             'Normal':''
         }
         
-        for node in mat.node_tree.nodes:
-            if node.type == 'TEX_IMAGE':
-                for output in node.outputs:
-                    if len(output.links) == 0:
-                        continue
-                    
-                    link = output.links[0]
-                    socket_name = link.to_socket.name
-                    if socket_name == 'Base Color':
-                        to_json['Albedo'] = node.image.name
-                    if socket_name == 'Metallic':
-                        to_json['Metalness'] = node.image.name
-                    if socket_name == 'Roughness':
-                        to_json['Roughness'] = node.image.name
-                            
-            if node.type == 'NORMAL_MAP':
-                for input in node.inputs:
-                    for link in input.links:
-                        if link.to_socket.name == 'Color':
-                            to_json['Normal'] = link.from_socket.node.image.name
-        
-        
-        with open(filepath, 'w', encoding='utf-8') as output:
-            output.write(json.dumps(to_json, indent=4))
+        # Every texture reaches the shader through a link, so only the links of the tree are walked
+        for link in mat.node_tree.links:
+            texture_node = link.from_node
+            if texture_node.type != 'TEX_IMAGE':
+                continue
+            
+            socket_name = link.to_socket.name
+            if link.to_node.type == 'NORMAL_MAP':
+                if socket_name == 'Color':
+                    to_json['Normal'] = texture_node.image.name
+                continue
+            
+            key = SOCKET_TO_KEY.get(socket_name)
+            if key is not None:
+                to_json[key] = texture_node.image.name
+        
+        
+        self._pending.append((write_json, (filepath, to_json, self._json_indent)))
     
     
     def export_light(self, object, filepath):
@@ -330,23 +637,34 @@ class SceneExporter(Operator, ExportHelper):
         elif object.data.type == 'SUN':
             to_json['Type'] = 'DirectionalLight'
             
-        with open(filepath, 'w', encoding='utf-8') as output:
-            output.write(json.dumps(to_json, indent=4))
+        self._pending.append((write_json, (filepath, to_json, self._json_indent)))
             
             
-    def export_armature(self, object, filepath):
-        '''Exports armature data to the given filepath'''
+    def export_armature(self, object, armature_obj, filepath):
+        '''Exports data of the object's armature to the given filepath'''
 
-        # Helper function to parse bone's data
-        def parse_bone_data(object, armature, bone):
-            # Calculate the inverse (bind pose matrix)
-            rest_matrix = bone.matrix_local
-            offset_matrix = rest_matrix.inverted()
+        console_log(f'Exporting armature to {filepath}...')
+        
+        bones = armature_obj.data.bones
+        bone_indices = {bone.name: index for index, bone in enumerate(bones)}
+        
+        # Rest matrices of all bones, foreach_get writes every matrix column by column, so this is the
+        # transposed rest matrix and inverting it gives the transposed inverse (bind pose matrix) directly
+        rest_matrices = np.empty(len(bones) * 16, dtype=np.float32)
+        bones.foreach_get('matrix_local', rest_matrices)
+        offset_matrices = np.linalg.inv(rest_matrices.reshape(-1, 4, 4).astype(np.float64)).tolist()
+        
+        to_json = {}
+        to_json['Armature'] = []
 
-            bone_transform = mathutils.Matrix.transposed(offset_matrix)
-            bone_translation = bone_transform[3]
+        # Walk the bone hierarchy, every entry is a bone and the list its info is appended to
+        vertex_groups = object.vertex_groups
+        stack = [(bone, to_json['Armature']) for bone in bones if bone.parent is None]
+        stack.reverse()
+        while stack:
+            bone, siblings = stack.pop()
             
-            bone_group = object.vertex_groups.get(bone.name)
+            bone_group = vertex_groups.get(bone.name)
             bone_index = -1
             if bone_group is not None:
                 bone_index = bone_group.index
@@ -354,103 +672,77 @@ class SceneExporter(Operator, ExportHelper):
             bone_info = {}
             bone_info['Name'] = bone.name
             bone_info['ID'] = bone_index
-            bone_info['Offset'] = {
-                'r0': f'{bone_transform[0][0]} {bone_transform[0][1]} {bone_transform[0][2]} {bone_transform[0][3]}',
-                'r1': f'{bone_transform[1][0]} {bone_transform[1][1]} {bone_transform[1][2]} {bone_transform[1][3]}',
-                'r2': f'{bone_transform[2][0]} {bone_transform[2][1]} {bone_transform[2][2]} {bone_transform[2][3]}',
-                'r3': f'{bone_translation[0]} {bone_translation[1]} {bone_translation[2]} {bone_translation[3]}'
-            }
+            bone_info['Offset'] = matrix_to_json(offset_matrices[bone_indices[bone.name]])
             bone_info['Children'] = []
-            for child_bone in bone.children:
-                bone_info['Children'].append(parse_bone_data(object, armature, child_bone))
-
-            return bone_info
-
-
-        console_log(f'Exporting armature to {filepath}...')
-
-        armature_obj = None
-        armature = None
-        
-        for mod in object.modifiers:
-            if mod.name == 'Armature':
-                armature_obj = mod.object
-                armature = armature_obj.data
-        
-        if armature_obj == None:
-            console_log(f'Armature for {object.name} not found')
-            return
-        
-        to_json = {}
-        to_json['Armature'] = []
-
-        for bone in armature.bones:
-            if bone.parent is None:
-                to_json['Armature'].append(parse_bone_data(object, armature, bone))
+            siblings.append(bone_info)
+            
+            stack.extend((child_bone, bone_info['Children']) for child_bone in reversed(bone.children[:]))
 
-        with open(filepath, 'w', encoding='utf-8') as output:
-            output.write(json.dumps(to_json, indent=4))
+        self._pending.append((write_json, (filepath, to_json, self._json_indent)))
 
 
-    def export_animation(self, object, filepath):
-        '''Exports animation data to the given filepath'''
+    def export_animation(self, armature_obj, filepath):
+        '''Exports animation data of the armature to the given filepath'''
 
-        armature_obj = None
-        armature = None
-        
-        for mod in object.modifiers:
-            if mod.name == 'Armature':
-                armature_obj = mod.object
-                armature = armature_obj.data
-        
-        if armature_obj == None:
-            console_log(f'Armature for {object.name} not found')
-            return
-        
         pose = armature_obj.pose
         action = armature_obj.animation_data.action
 
-        animations = {}
-        animations['Frames'] = {}
-
         # Determine the frame range of the action
         frame_start = int(action.frame_range[0])
         frame_end = int(action.frame_range[1])
         
-        animations['Duration'] = frame_end - frame_start
-        animations['FrameRate'] = bpy.context.scene.render.fps
+        duration = frame_end - frame_start
+        frame_rate = self._scene.render.fps
 
-        current_frame_index = 0
-        for frame_index in range(frame_start, frame_end + 1):
-            bpy.context.scene.frame_set(frame_index)
-
-            animations['Frames'][current_frame_index] = {}
-            for bone in pose.bones:
-                parent_bone = bone.parent
-                local_matrix = None
-
-                # Calculate the local matrix relative to the parent
-                if parent_bone:
-                    parent_matrix = parent_bone.matrix
-                    local_matrix = parent_matrix.inverted() @ bone.matrix
-                else:
-                    # No parent, local matrix equals pose matrix
-                    local_matrix = bone.matrix
+        # Without drivers or constraints the bone transforms come straight from the F-Curves,
+        # otherwise every frame is evaluated by the scene
+        frames = range(frame_start, frame_end + 1)
+        sampled_bones = sample_pose_fcurves(armature_obj, action, frames)
+        
+        # Frames are encoded and written one by one, the whole animation is never held in memory
+        frame_set = self._scene.frame_set
+        with open(filepath, 'w', encoding='utf-8', buffering=FILE_BUFFER_SIZE) as output:
+            output.write('{"Frames":{')
+            
+            for current_frame_index, frame_index in enumerate(frames):
+                frame = {}
                 
-                matrix = mathutils.Matrix.transposed(local_matrix)
-                # Decompose the local matrix into location and rotation
-                location, rotation, _ = local_matrix.decompose()
+                if sampled_bones is not None:
+                    for bone_name, locations, rotations in sampled_bones:
+                        location = locations[current_frame_index]
+                        rotation = rotations[current_frame_index]
+                        frame[bone_name] = {
+                            'LocationVec': f'{location[0]} {location[1]} {location[2]} 1.0',
+                            'RotationQuat': f'{rotation[1]} {rotation[2]} {rotation[3]} {rotation[0]}'
+                        }
+                else:
+                    frame_set(frame_index)
+                    
+                    for bone in pose.bones:
+                        parent_bone = bone.parent
+                        local_matrix = None
+
+                        # Calculate the local matrix relative to the parent
+                        if parent_bone:
+                            parent_matrix = parent_bone.matrix
+                            local_matrix = parent_matrix.inverted() @ bone.matrix
+                        else:
+                            # No parent, local matrix equals pose matrix
+                            local_matrix = bone.matrix
+                        
+                        # Decompose the local matrix into location and rotation
+                        location, rotation, _ = local_matrix.decompose()
+                        
+                        frame[bone.name] = {
+                            'LocationVec': f'{location[0]} {location[1]} {location[2]} 1.0',
+                            'RotationQuat': f'{rotation[1]} {rotation[2]} {rotation[3]} {rotation[0]}'
+                        }
                 
-                animations['Frames'][current_frame_index][bone.name] = {
-                    'LocationVec': f'{location[0]} {location[1]} {location[2]} 1.0',
-                    'RotationQuat': f'{rotation[1]} {rotation[2]} {rotation[3]} {rotation[0]}'
-                }
-            current_frame_index += 1
-        
-        to_json = animations
-        
-        with open(filepath, 'w', encoding='utf-8') as output:
-            output.write(json.dumps(to_json, indent=4))
+                if current_frame_index > 0:
+                    output.write(',')
+                output.write(f'"{current_frame_index}":{encode_json(frame)}')
+            
+            output.write(f'}},"Duration":{duration},"FrameRate":{frame_rate}}}')
             
 
 # Only needed if you want to add into a dynamic menu